@@ -0,0 +1,307 @@
+import asyncio
+import aiohttp
+import functools
+import random
+import sqlite3
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from tqdm import tqdm
+from urllib.parse import urlencode
+
+# Decode JSON with orjson when available; the standard library is the fallback.
+try:
+    import orjson as json
+except ImportError:
+    import json
+
+# Run the event loop on uvloop when available; asyncio's own is the fallback.
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# -------------------------------
+# Constants
+#
+# Shared HTTP settings for the MLB stats API scripts in this folder.
+#
+# CONCURRENCY: Maximum number of requests in flight at once
+# MAX_RETRIES: Attempts made for a single request before giving up
+# MAX_BACKOFF: Longest wait in seconds between attempts
+# RETRY_STATUSES: Statuses worth retrying (rate limiting and server errors)
+# CACHE_FILE: SQLite file holding cached responses
+# CURRENT_SEASON_TTL: Seconds a cached current-season response stays fresh
+# HEADERS: Sent with every request; asks for compressed JSON bodies
+# SCHEDULE_URL: MLB stats API schedule location
+# SCHEDULE_FIELDS: Schedule fields to request (the API drops all others).
+#   This is the union of what the scripts read, so they all share one
+#   cached schedule per season. The linescore is hydrated for its
+#   currentInning.
+# LIVE_FEED_URL: MLB stats API live feed location, read for start times
+# GAME_DATETIME_FIELDS: Live feed fields holding a game's start time
+# -------------------------------
+CONCURRENCY = 32
+MAX_RETRIES = 5
+MAX_BACKOFF = 30
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+CACHE_FILE = "mlb_cache.sqlite"
+CURRENT_SEASON_TTL = 3600
+HEADERS = {
+    "Accept-Encoding": "gzip, deflate",
+    "User-Agent": "mlb-rules-study/1.0"
+}
+SCHEDULE_URL = "https://statsapi.mlb.com/api/v1/schedule"
+SCHEDULE_FIELDS = (
+    "dates,games,gamePk,teams,away,home,team,id,name,linescore,currentInning"
+)
+LIVE_FEED_URL = "https://statsapi.mlb.com/api/v1.1/game"
+GAME_DATETIME_FIELDS = "gameData,datetime,dateTime"
+# -------------------------------
+
+_cache_db = None
+
+def is_fresh(fetched_at, season):
+    """
+    Whether a cached response about a season can be served without asking
+    the API again. A response fetched after its season's year ended holds
+    final data and never expires; one fetched earlier (or with no recorded
+    fetch time) stays fresh for CURRENT_SEASON_TTL seconds.
+    """
+    fetched_at = fetched_at or 0
+    if season is not None and datetime.fromtimestamp(fetched_at).year > season:
+        return True
+    return time.time() - fetched_at < CURRENT_SEASON_TTL
+
+def run(coro):
+    """Run a script's main coroutine, on uvloop when it is installed."""
+    if uvloop is not None:
+        return uvloop.run(coro)
+    return asyncio.run(coro)
+
+def collector(main):
+    """
+    Decorate a script's main(session, semaphore) so it can be called with
+    no arguments when the script runs on its own: it then gets a fresh
+    session and a Semaphore(CONCURRENCY). pipeline.py passes in the
+    session and semaphore it shares across every script.
+    """
+    @functools.wraps(main)
+    async def wrapper(session=None, semaphore=None):
+        semaphore = semaphore or asyncio.Semaphore(CONCURRENCY)
+        if session is None:
+            async with make_session() as session:
+                return await main(session, semaphore)
+        return await main(session, semaphore)
+    return wrapper
+
+def get_cache_db():
+    """Open the response cache on first use, creating its table if needed."""
+    global _cache_db
+    if _cache_db is None:
+        _cache_db = sqlite3.connect(CACHE_FILE)
+        _cache_db.execute("PRAGMA journal_mode=WAL")
+        _cache_db.execute("PRAGMA synchronous=NORMAL")
+        _cache_db.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, body BLOB, fetched_at REAL, etag TEXT)"
+        )
+        # Add columns missing from caches written by older versions; their
+        # rows have no fetch time or ETag, so they are refetched once.
+        columns = {row[1] for row in _cache_db.execute("PRAGMA table_info(responses)")}
+        for column, kind in (("fetched_at", "REAL"), ("etag", "TEXT")):
+            if column not in columns:
+                _cache_db.execute(f"ALTER TABLE responses ADD COLUMN {column} {kind}")
+    return _cache_db
+
+def csv_datetime_text(datetime_str):
+    """
+    Rewrite an API dateTime string (YYYY-MM-DDTHH:MM:SSZ) as the text pandas
+    writes for UTC timestamps (YYYY-MM-DD HH:MM:SS+00:00). Slicing the
+    string skips both the datetime parse and to_csv's per-value
+    timestamp formatting, the slowest part of writing these columns.
+    """
+    return f"{datetime_str[:10]} {datetime_str[11:19]}+00:00"
+
+def csv_datetime(datetimes):
+    """Apply csv_datetime_text to a Series of dateTime strings, keeping NaNs."""
+    return datetimes.map(csv_datetime_text, na_action="ignore")
+
+def make_session():
+    """
+    Create a ClientSession that pools keep-alive connections to the
+    stats API, caches DNS lookups between requests and asks for
+    compressed responses (aiohttp decompresses them transparently).
+    """
+    connector = aiohttp.TCPConnector(
+        limit=64,
+        limit_per_host=32,
+        ttl_dns_cache=300,
+        keepalive_timeout=60
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        # A socket that cannot connect quickly fails fast instead of using
+        # the whole request budget. (connect= would also count the time a
+        # request waits for a free pooled connection.)
+        timeout=aiohttp.ClientTimeout(total=60, sock_connect=10),
+        headers=HEADERS
+    )
+
+async def fetch_json(session, url, params=None, semaphore=None, cache=False,
+                     season=None):
+    """
+    GET a stats API URL and decode the JSON body.
+    Rate limiting, server errors, dropped connections and timeouts are
+    retried with jittered exponential backoff, or after the delay the
+    server asks for in Retry-After. A connection error that outlasts the
+    retries is raised.
+    The semaphore, if given, is held only while a request is on the wire;
+    it is released during backoff and before decoding, so the next
+    request can download while this body is parsed.
+    With cache=True the raw body is stored on disk and later calls for the
+    same URL and params are served from there while it is fresh for the
+    season the response is about (see is_fresh). An expired entry is
+    revalidated with its ETag, so an unchanged resource comes back as a
+    bodiless 304 and the stored body is reused.
+    Returns (status, data), where data is None unless the status is 200.
+    """
+    stale = None
+    if cache:
+        key = f"{url}?{urlencode(sorted((params or {}).items()))}"
+        row = get_cache_db().execute(
+            "SELECT body, fetched_at, etag FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row and is_fresh(row[1], season):
+            return 200, json.loads(row[0])
+        if row and row[2]:
+            stale = row
+    headers = {"If-None-Match": stale[2]} if stale else None
+
+    limit = semaphore or nullcontext()
+    for attempt in range(MAX_RETRIES):
+        try:
+            async with limit:
+                async with session.get(url, params=params, headers=headers) as response:
+                    status = response.status
+                    if status == 200:
+                        body = await response.read()
+                        etag = response.headers.get("ETag")
+                    retry_after = response.headers.get("Retry-After", "")
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if attempt == MAX_RETRIES - 1:
+                raise
+            retry_after = ""
+        else:
+            if status == 200:
+                break
+            if status == 304 and stale:
+                body, etag = stale[0], stale[2]
+                break
+
+            # Give up on client errors or once the retries are spent.
+            if status not in RETRY_STATUSES or attempt == MAX_RETRIES - 1:
+                return status, None
+
+        # Jitter keeps the workers that were limited together from
+        # retrying together.
+        delay = float(retry_after) if retry_after.isdigit() else 2 ** attempt
+        await asyncio.sleep(min(delay, MAX_BACKOFF) + random.random())
+
+    if cache:
+        db = get_cache_db()
+        db.execute(
+            "INSERT OR REPLACE INTO responses (key, body, fetched_at, etag) "
+            "VALUES (?, ?, ?, ?)",
+            (key, body, time.time(), etag)
+        )
+        db.commit()
+    return 200, json.loads(body)
+
+async def map_pooled(fetch, items, **progress_options):
+    """
+    Await fetch(item) for every item using CONCURRENCY worker tasks that
+    share one iterator, rather than one task per item. A tqdm bar
+    (configured by progress_options) advances as each item finishes,
+    redrawing at most a few times a second.
+    If a fetch raises, the other workers are cancelled and the error is
+    raised, so no further items are fetched.
+    Returns the results in completion order.
+    """
+    items = list(items)
+    pending = iter(items)
+    results = []
+    progress_options.setdefault("mininterval", 0.5)
+    progress_options.setdefault("miniters", CONCURRENCY)
+    progress = tqdm(total=len(items), **progress_options)
+
+    async def worker():
+        for item in pending:
+            results.append(await fetch(item))
+            progress.update(1)
+
+    workers = [asyncio.create_task(worker()) for _ in range(CONCURRENCY)]
+    try:
+        await asyncio.gather(*workers)
+    except BaseException:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        raise
+    finally:
+        progress.close()
+    return results
+
+async def get_season_games(session, season, game_types, semaphore=None):
+    """
+    Fetch the MLB schedule for a season and return its games as one flat
+    list. Each game is limited to SCHEDULE_FIELDS; games without a gamePk
+    are skipped.
+    Errors are printed and give an empty list.
+    """
+    params = {
+        "sportId": 1,  # MLB
+        "season": season,
+        "gameTypes": game_types,
+        "hydrate": "linescore",
+        "fields": SCHEDULE_FIELDS
+    }
+    try:
+        status, schedule = await fetch_json(
+            session, SCHEDULE_URL, params, semaphore,
+            cache=True, season=season
+        )
+        if status != 200:
+            print(f"Failed to fetch schedule for season {season}. Status: {status}")
+            return []
+    except Exception as e:
+        print(f"Exception while fetching schedule for season {season}: {e}")
+        return []
+
+    return [
+        game
+        for day in schedule.get("dates", [])
+        for game in day.get("games", [])
+        if game.get("gamePk")
+    ]
+
+async def get_game_datetime(session, game_pk, season, semaphore=None):
+    """
+    Fetch a game's start dateTime (YYYY-MM-DDTHH:MM:SSZ) from its live
+    feed, limited to GAME_DATETIME_FIELDS. Unlike a schedule entry's
+    gameDate, which for a postponed game can be the date it was first set
+    for, this is the time the game actually started. The response is
+    cached, so scripts run together read it once.
+    Returns None if the feed could not be fetched or has no dateTime.
+    """
+    status, data = await fetch_json(
+        session,
+        f"{LIVE_FEED_URL}/{game_pk}/feed/live",
+        {"fields": GAME_DATETIME_FIELDS},
+        semaphore,
+        cache=True,
+        season=season
+    )
+    if status != 200:
+        return None
+    return data.get("gameData", {}).get("datetime", {}).get("dateTime")
@@ -1,21 +1,27 @@
 import asyncio
-import aiohttp
 import pandas as pd
 import time
+from itertools import islice
 from tqdm import tqdm
+from _mlb_client import (
+    CONCURRENCY, collector, csv_datetime, fetch_json, get_season_games, run
+)
 
 # -------------------------------
 # Constants
 #
-# BASE_URL: MLB stats API location for schedules
-# LIVE_FEED_URL: MLB stats API live feed location for game details
+# BASE_URL_GAME: MLB stats API location for live game data
+# GAME_FIELDS: Live feed fields to request (the API drops all others)
 # GAME_TYPES: S = Spring training, R = Regular season, P = Post season
 # FIRST_SEASON: Year to start (included)
 # LAST_SEASON: Year to end (not included)
 # OUTPUT_FILE: File name and extension for export
 # -------------------------------
-BASE_URL = "https://statsapi.mlb.com/api/v1"
-LIVE_FEED_URL = "https://statsapi.mlb.com/api/v1.1/game"
+BASE_URL_GAME = "https://statsapi.mlb.com/api/v1.1"
+GAME_FIELDS = (
+    "gameData,datetime,dateTime,teams,home,away,name,"
+    "liveData,linescore,innings,num,runs,plays,allPlays,about,inning,result,rbi"
+)
 GAME_TYPES = "R"
 FIRST_SEASON = 2014
 LAST_SEASON = 2025
@@ -24,61 +30,34 @@ OUTPUT_FILE = "extra_innings_games.csv"
 
 async def fetch_season_games(session, season, semaphore):
     """
-    Fetch the MLB schedule for a given season and return unique game entries.
+    Fetch the MLB schedule for a given season and return unique game entries
+    for games that went past the 9th inning.
     Each entry is a dict with season and game_pk.
     """
-    schedule_url = f"{BASE_URL}/schedule"
-    params = {
-        "sportId": 1,  # MLB
-        "season": season,
-        "gameTypes": GAME_TYPES
-    }
-    
-    async with semaphore:
-        try:
-            async with session.get(schedule_url, params=params) as response:
-                if response.status != 200:
-                    print(f"Failed to fetch schedule for season {season}. Status: {response.status}")
-                    return []
-                data = await response.json()
-        except Exception as e:
-            print(f"Exception while fetching schedule for season {season}: {e}")
-            return []
-    
-    # Extract unique game info from the schedule output.
-    games = []
-    for date_entry in data.get("dates", []):
-        for game in date_entry.get("games", []):
-            game_pk = game.get("gamePk")
-            if game_pk:
-                games.append({
-                    "season": season,
-                    "game_pk": game_pk
-                })
-    return games
+    # The linescore's currentInning is the final inning of a finished
+    # game, so extra inning games can be picked out of the schedule
+    # without downloading every live feed.
+    games = await get_season_games(session, season, GAME_TYPES, semaphore)
 
-async def fetch_game_details(session, game, semaphore):
+    # Extract unique extra inning game info from the schedule output.
+    return [
+        {"season": season, "game_pk": game["gamePk"]}
+        for game in games
+        if game.get("linescore", {}).get("currentInning", 0) > 9
+    ]
+
+def parse_game_details(data, game):
     """
-    Fetch game details (via the live feed) for a given game_pk.
-    If the game went over 9 innings, extract and return the desired info:
+    Extract extra-inning details from a decoded live feed.
+    If the game went over 9 innings, return the desired info:
     year, game_pk, team_winner, team_loser, final_inning.
     """
     game_pk = game["game_pk"]
-    feed_url = f"{LIVE_FEED_URL}/{game_pk}/feed/live"
-    
-    async with semaphore:
-        try:
-            async with session.get(feed_url) as response:
-                if response.status != 200:
-                    print(f"Failed to fetch details for game_pk {game_pk}. Status: {response.status}")
-                    return None
-                data = await response.json()
-        except Exception as e:
-            print(f"Exception while fetching details for game_pk {game_pk}: {e}")
-            return None
 
     try:
-        linescore = data["liveData"]["linescore"]
+        game_data = data["gameData"]
+        live_data = data["liveData"]
+        linescore = live_data["linescore"]
         innings   = linescore.get("innings", [])
         if len(innings) <= 9:
             return None  # Game did not go extra innings.
@@ -86,37 +65,37 @@ async def fetch_game_details(session, game, semaphore):
         # Final inning number
         final_inning = innings[-1].get("num", len(innings))
 
-        # Total runs scored after the 9th
+        # Total runs scored after the 9th (innings are listed in order,
+        # so extras start at index 9)
         total_extra_runs = sum(
             (inn.get("home", {}).get("runs", 0) +
              inn.get("away", {}).get("runs", 0))
-            for inn in innings
-            if inn.get("num", 0) > 9
+            for inn in innings[9:]
         )
 
-        # Count batters until first run in extras
-        plays = data["liveData"]["plays"]["allPlays"]
-        batters = 0
-        batters_until_first_run = None
-        for pl in plays:
-            inn = pl["about"]["inning"]
-            if inn <= 9:
-                continue
-            batters += 1
-            rbi = pl["result"].get("rbi", 0)
-            if rbi and batters_until_first_run is None:
-                batters_until_first_run = batters
+        # Plays are in game order, so walk back from the last play to find
+        # where extras begin instead of stepping through nine innings.
+        plays = live_data["plays"]["allPlays"]
+        first_extra_play = len(plays)
+        while first_extra_play and plays[first_extra_play - 1]["about"]["inning"] > 9:
+            first_extra_play -= 1
+
+        # Count batters until first run in extras. If no RBI is found
+        # (example: game ended on an error), the loop runs out and leaves
+        # batters_until_first_run at the total number of batters faced.
+        batters_until_first_run = 0
+        extra_plays = islice(plays, first_extra_play, None)
+        for batters_until_first_run, pl in enumerate(extra_plays, start=1):
+            if pl["result"].get("rbi", 0):
                 break
-        # If no RBI was found (example: game ended on an error),
-        # set batters_until_first_run to the total number of batters faced.
-        if batters_until_first_run is None:
-            batters_until_first_run = batters
 
         # Teams & winner/loser
-        home = data["gameData"]["teams"]["home"]["name"]
-        away = data["gameData"]["teams"]["away"]["name"]
-        runs_home = linescore["teams"]["home"]["runs"]
-        runs_away = linescore["teams"]["away"]["runs"]
+        teams = game_data["teams"]
+        home = teams["home"]["name"]
+        away = teams["away"]["name"]
+        score = linescore["teams"]
+        runs_home = score["home"]["runs"]
+        runs_away = score["away"]["runs"]
 
         if runs_home > runs_away:
             winner, loser = home, away
@@ -124,7 +103,7 @@ async def fetch_game_details(session, game, semaphore):
             winner, loser = away, home
 
         # Game datetime
-        gdt = data["gameData"]["datetime"].get("dateTime")
+        gdt = game_data["datetime"].get("dateTime")
 
         return {
             "year": game["season"],
@@ -141,44 +120,87 @@ async def fetch_game_details(session, game, semaphore):
         print(f"Error processing game_pk {game_pk}: {e}")
         return None
 
-async def main():
-    semaphore = asyncio.Semaphore(10)  # Limit concurrent HTTP requests.
-    all_games = []
+async def fetch_game_details(session, game, semaphore):
+    """
+    Fetch game details (via the live feed) for a given game_pk
+    and extract them with parse_game_details.
+    """
+    game_pk = game["game_pk"]
+    url = f"{BASE_URL_GAME}/game/{game_pk}/feed/live"
+    
+    try:
+        status, data = await fetch_json(
+            session, url, {"fields": GAME_FIELDS}, semaphore,
+            cache=True, season=game["season"]
+        )
+        if status != 200:
+            print(f"Failed to fetch details for game_pk {game_pk}. Status: {status}")
+            return None
+    except Exception as e:
+        print(f"Exception while fetching details for game_pk {game_pk}: {e}")
+        return None
 
-    async with aiohttp.ClientSession() as session:
-        # Process seasons 2014 through 2024.
-        season_tasks = []
-        for season in range(FIRST_SEASON, LAST_SEASON):
-            print(f"Fetching schedule for season {season}...")
-            season_tasks.append(fetch_season_games(session, season, semaphore))
-        
-        seasons_results = await asyncio.gather(*season_tasks)
-        for season_games in seasons_results:
-            if season_games:
-                all_games.extend(season_games)
+    return parse_game_details(data, game)
 
-        if not all_games:
-            print("No games found in schedules.")
+async def detail_worker(session, queue, semaphore, results, progress):
+    """
+    Pull games off the queue and fetch their details until a None
+    sentinel arrives, keeping the extra inning results.
+    """
+    while True:
+        game = await queue.get()
+        if game is None:
             return
-        
-        print(f"Total games found: {len(all_games)}. Fetching game details...")
-        # Launch detail tasks for each game and wrap them with a progress bar.
-        detail_tasks = [asyncio.create_task(fetch_game_details(session, game, semaphore))
-                        for game in all_games]
-        
-        results = []
-        for fut in tqdm(asyncio.as_completed(detail_tasks), total=len(detail_tasks)):
-            res = await fut
-            if res:
-                results.append(res)
+        res = await fetch_game_details(session, game, semaphore)
+        if res:
+            results.append(res)
+        progress.update(1)
+
+@collector
+async def main(session, semaphore):
+    results = []
+
+    # Process seasons 2014 through 2024.
+    season_tasks = []
+    for season in range(FIRST_SEASON, LAST_SEASON):
+        print(f"Fetching schedule for season {season}...")
+        season_tasks.append(fetch_season_games(session, season, semaphore))
     
+    # A fixed pool of workers drains a bounded queue of games, so only
+    # CONCURRENCY detail fetches exist at once instead of one task per game.
+    queue = asyncio.Queue(maxsize=2 * CONCURRENCY)
+    progress = tqdm(total=0, desc="Fetching game details")
+    workers = [
+        asyncio.create_task(detail_worker(session, queue, semaphore, results, progress))
+        for _ in range(CONCURRENCY)
+    ]
+
+    # Queue each season's games as soon as its schedule arrives,
+    # rather than waiting on every schedule.
+    for fut in asyncio.as_completed(season_tasks):
+        season_games = await fut
+        progress.total += len(season_games)
+        progress.refresh()
+        for game in season_games:
+            await queue.put(game)
+
+    # One sentinel per worker, then wait for the queue to drain.
+    for _ in workers:
+        await queue.put(None)
+    await asyncio.gather(*workers)
+    progress.close()
+
+    if not progress.total:
+        print("No extra inning games found in schedules.")
+        return
+
     if not results:
         print("No extra inning games found.")
         return
     
     # Build the DataFrame with the selected columns.
     df = pd.DataFrame(results)
-    df["game_datetime"] = pd.to_datetime(df["game_datetime"])
+    df["game_datetime"] = csv_datetime(df["game_datetime"])
     df = df[[
         "year", "game_datetime", "game_pk",
         "team_winner", "team_loser", "final_inning",
@@ -192,6 +214,6 @@ async def main():
 
 if __name__ == "__main__":
     start_time = time.time()
-    asyncio.run(main())
+    run(main())
     elapsed_time = time.time() - start_time
     print(f"Time elapsed: {elapsed_time:.2f} seconds")
@@ -1,21 +1,20 @@
 import asyncio
-import aiohttp
 import pandas as pd
 import time
-from tqdm import tqdm
+from _mlb_client import (
+    collector, fetch_json, get_game_datetime, get_season_games, map_pooled, run
+)
 
 # -------------------------------
 # Constants
 #
-# BASE_URL:      MLB stats API for schedules
-# LIVE_FEED_URL: MLB stats API for live game data
+# BASE_URL:      MLB stats API for boxscores
 # GAME_TYPES:    S = Spring training, R = Regular season, P = Post season
 # FIRST_SEASON:  Year to start (inclusive)
 # LAST_SEASON:   Year to end   (exclusive)
 # OUTPUT_FILE:   CSV output filename
 # -------------------------------
 BASE_URL      = "https://statsapi.mlb.com/api/v1"
-LIVE_FEED_URL = "https://statsapi.mlb.com/api/v1.1/game"
 GAME_TYPES    = "R"
 FIRST_SEASON  = 2014
 LAST_SEASON   = 2025
@@ -36,49 +35,46 @@ NL_TEAM_IDS = {
 # -------------------------------
 
 async def fetch_season_games(session, season, sem):
-    """Fetch all game PKs for a given season."""
-    url = f"{BASE_URL}/schedule"
-    params = {"sportId": 1, "season": season, "gameTypes": GAME_TYPES}
-    async with sem:
-        resp = await session.get(url, params=params)
-        if resp.status != 200:
-            print(f"[Season {season}] schedule error {resp.status}")
-            return []
-        data = await resp.json()
+    """Fetch all NL home game PKs for a given season."""
     games = []
-    for date_entry in data.get("dates", []):
-        for g in date_entry.get("games", []):
-            home_team = g.get("teams", {}) \
-                         .get("home", {}) \
-                         .get("team", {}) \
-                         .get("id")
-            if home_team not in NL_TEAM_IDS:
-                continue
-            pk = g.get("gamePk")
-            if pk:
-                games.append({"season": season, "game_pk": pk})
+    for g in await get_season_games(session, season, GAME_TYPES, sem):
+        home_team = g.get("teams", {}) \
+                     .get("home", {}) \
+                     .get("team", {}) \
+                     .get("id")
+        if home_team not in NL_TEAM_IDS:
+            continue
+        games.append({
+            "season": season,
+            "game_pk": g["gamePk"]
+        })
     return games
 
 async def fetch_and_compute_ops(session, info, sem):
     """
-    Fetch live feed for game_pk, determine position ('P' or 'DH'),
-    then compute OPS for that position among the home (NL) team.
+    Fetch the boxscore and start time for game_pk, determine position
+    ('P' or 'DH'), then compute OPS for that position among the home (NL)
+    team.
     """
     season = info["season"]
     pk     = info["game_pk"]
     pos    = "DH" if season in DH_SEASONS else "P"
-    url    = f"{LIVE_FEED_URL}/{pk}/feed/live"
+    url    = f"{BASE_URL}/game/{pk}/boxscore"
 
-    async with sem:
-        resp = await session.get(url)
-        if resp.status != 200:
-            print(f"[Game {pk}] error {resp.status}")
+    try:
+        (status, data), gdt = await asyncio.gather(
+            fetch_json(session, url, semaphore=sem, cache=True, season=season),
+            get_game_datetime(session, pk, season, sem)
+        )
+        if status != 200:
+            print(f"[Game {pk}] error {status}")
             return None
-        data = await resp.json()
+    except Exception as e:
+        print(f"[Game {pk}] request error: {e}")
+        return None
 
     try:
-        box = data["liveData"]["boxscore"]["teams"]["home"]
-        gdt = data["gameData"]["datetime"].get("dateTime")
+        box = data["teams"]["home"]
         batters = box["batters"]                # List of player IDs
         players = box["players"]                # List of player ID details
 
@@ -92,23 +88,17 @@ async def fetch_and_compute_ops(session, info, sem):
             if pinfo["position"]["abbreviation"] != pos:
                 continue
             stats = pinfo.get("stats", {}).get("batting", {})
-            ab   = stats.get("atBats", 0)
             h    = stats.get("hits", 0)
-            bb   = stats.get("baseOnBalls", 0)
-            hbp  = stats.get("hitByPitch", 0)
-            sf   = stats.get("sacrificeFlies", 0)
-            dbls = stats.get("doubles", 0)
-            trp  = stats.get("triples", 0)
-            hr   = stats.get("homeRuns", 0)
             # Accumulate
-            AB  += ab
+            AB  += stats.get("atBats", 0)
             H   += h
-            BB  += bb
-            HBP += hbp
-            SF  += sf
-            # Total bases: singles + 2*doubles + 3*triples + 4*homerun
-            singles = h - dbls - trp - hr
-            TB += singles + 2*dbls + 3*trp + 4*hr
+            BB  += stats.get("baseOnBalls", 0)
+            HBP += stats.get("hitByPitch", 0)
+            SF  += stats.get("sacrificeFlies", 0)
+            # Total bases: singles + 2*doubles + 3*triples + 4*homerun,
+            # which is hits plus the extra bases of each extra-base hit
+            TB += (h + stats.get("doubles", 0) + 2*stats.get("triples", 0)
+                   + 3*stats.get("homeRuns", 0))
 
         # Calculate on-base percentage (OBP) and slugging (SLG)
         obp_denom = AB + BB + HBP + SF
@@ -131,37 +121,34 @@ async def fetch_and_compute_ops(session, info, sem):
         print(f"[Game {pk}] processing error: {e}")
         return None
 
-async def main():
-    semaphore = asyncio.Semaphore(10)  # Limit concurrent HTTP requests.
+@collector
+async def main(session, semaphore):
     games = []
 
-    async with aiohttp.ClientSession() as session:
-        # Process seasons as defined.
-        season_tasks = []
-        for season in range(FIRST_SEASON, LAST_SEASON):
-            print(f"Fetching schedule for season {season}...")
-            season_tasks.append(fetch_season_games(session, season, semaphore))
-        
-        seasons_results = await asyncio.gather(*season_tasks)
-        for season_games in seasons_results:
-            if season_games:
-                games.extend(season_games)
-
-        if not games:
-            print("No games found in schedules.")
-            return
-        
-        print(f"Total games found: {len(games)}. Fetching game details...")
-        # Launch detail tasks for each game and wrap them with a progress bar.
-        detail_tasks = [asyncio.create_task(fetch_and_compute_ops(session, g, semaphore))
-                        for g in games]
-        
-        results = []
-        for fut in tqdm(asyncio.as_completed(detail_tasks), total=len(detail_tasks)):
-            res = await fut
-            if res:
-                results.append(res)
+    # Process seasons as defined.
+    season_tasks = []
+    for season in range(FIRST_SEASON, LAST_SEASON):
+        print(f"Fetching schedule for season {season}...")
+        season_tasks.append(fetch_season_games(session, season, semaphore))
     
+    seasons_results = await asyncio.gather(*season_tasks)
+    for season_games in seasons_results:
+        if season_games:
+            games.extend(season_games)
+
+    if not games:
+        print("No games found in schedules.")
+        return
+    
+    print(f"Total games found: {len(games)}. Fetching game details...")
+    # Fetch game details from a worker pool with a progress bar.
+    results = [
+        res for res in await map_pooled(
+            lambda g: fetch_and_compute_ops(session, g, semaphore), games
+        )
+        if res
+    ]
+
     if not results:
         print("Error in results.")
         return
@@ -176,6 +163,6 @@ async def main():
 # Run async functions and report the elapsed time.
 if __name__ == "__main__":
     start_time = time.time()
-    asyncio.run(main())
+    run(main())
     elapsed_time = time.time() - start_time
     print(f"Time elapsed: {elapsed_time:.2f} seconds")
@@ -1,62 +1,67 @@
 import asyncio
-import aiohttp
-import pandas as pd
+import csv
+import os
 import time
-from tqdm import tqdm
+from _mlb_client import (
+    collector, csv_datetime_text, fetch_json, get_game_datetime,
+    get_season_games, map_pooled, run
+)
 
 # -------------------------------
 # Constants
 #
-# BASE_URL_GAME: MLB stats API location for live game data
-# BASE_URL_SCHEDULE: MLB stats API location for schedules
+# BASE_URL: MLB stats API location for boxscores
+# BOXSCORE_FIELDS: Boxscore fields to request (the API drops all others)
 # GAME_TYPES: S = Spring training, R = Regular season, P = Post season
 # FIRST_SEASON: Year to start (included)
 # LAST_SEASON: Year to end (not included)
 # OUTPUT_FILE: File name and extension for export
+# OUTPUT_COLUMNS: CSV header, in the order each row is written
 # -------------------------------
-BASE_URL_GAME = "https://statsapi.mlb.com/api/v1.1"
-BASE_URL_SCHEDULE = "https://statsapi.mlb.com/api/v1"
+BASE_URL = "https://statsapi.mlb.com/api/v1"
+BOXSCORE_FIELDS = "teams,home,away,team,name,pitchers"
 GAME_TYPES = "R"
 FIRST_SEASON = 2014
 LAST_SEASON = 2025
 OUTPUT_FILE = "pitcher_appearances.csv"
+OUTPUT_COLUMNS = ["game_datetime", "game_id", "pitcher_id", "team_name", "year"]
 # -------------------------------
 
-# Async function to fetch the live feed for a given game
-# and extract pitcher IDs along with team info.
-async def fetch_game_data(session, game_pk, semaphore):
-    url = f"{BASE_URL_GAME}/game/{game_pk}/feed/live"
-    async with semaphore:
-        try:
-
-            # Handle unwanted status
-            async with session.get(url) as response:
-                if response.status != 200:
-                    print(f"Failed to fetch live feed for game {game_pk}. Status: {response.status}")
-                    return None
-                data = await response.json()
-        except Exception as e:
-            print(f"Exception for game {game_pk}: {e}")
-            return None
-
-    # Extract game ID and datetime
-    game_data = data.get("gameData", {})
-    game_info = game_data.get("game", {})
-    game_id = game_info.get("pk")
-    
-    datetime_info = game_data.get("datetime", {})
-    game_datetime = datetime_info.get("dateTime")
-    
-    if not game_id or not game_datetime:
-        print(f"Missing game id or dateTime for game {game_pk}")
-        return None
-
-    # Navigate to the boxscore section for teams and their pitchers
-    boxscore = data.get("liveData", {}).get("boxscore", {})
-    teams = boxscore.get("teams", {})
+# Async function to fetch the boxscore and start time for a given game
+# and extract one CSV row per pitcher, with team info.
+async def fetch_game_data(session, game_pk, season, semaphore):
+    try:
+        (status, data), game_datetime = await asyncio.gather(
+            fetch_json(
+                session, f"{BASE_URL}/game/{game_pk}/boxscore",
+                {"fields": BOXSCORE_FIELDS}, semaphore,
+                cache=True, season=season
+            ),
+            get_game_datetime(session, game_pk, season, semaphore)
+        )
+
+        # Handle unwanted status
+        if status != 200:
+            print(f"Failed to fetch boxscore for game {game_pk}. Status: {status}")
+            return []
+    except Exception as e:
+        print(f"Exception for game {game_pk}: {e}")
+        return []
+
+    if not game_datetime:
+        print(f"Missing dateTime for game {game_pk}")
+        return []
+
+    # The API returns dateTime as YYYY-MM-DDTHH:MM:SSZ, so the year is the
+    # first four characters.
+    year = int(game_datetime[:4])
+    game_datetime = csv_datetime_text(game_datetime)
+
+    # Navigate to the boxscore teams and their pitchers
+    teams = data.get("teams", {})
 
     # Process both home and away team data
-    game_pitcher_entries = []
+    rows = []
     for side in ["home", "away"]:
         # Game and pitcher information
         team_data = teams.get(side, {})
@@ -64,87 +69,68 @@ async def fetch_game_data(session, game_pk, semaphore):
         team_name = team_info.get("name")
         pitchers = team_data.get("pitchers", [])
 
-        # Append one entry per pitcher ID
-        for pitcher_id in pitchers:
-            game_pitcher_entries.append({
-                "game_datetime": game_datetime,
-                "game_id": game_id,
-                "pitcher_id": pitcher_id,
-                "team_name": team_name
-            })
-    return game_pitcher_entries
-
-# Async function to fetch all game primary keys (gamePk) for a given season.
-async def fetch_season_games(session, season):
-    schedule_url = f"{BASE_URL_SCHEDULE}/schedule"
-    params = {
-        "sportId": 1, # MLB level of play
-        "season": season,
-        "gameTypes": GAME_TYPES
-    }
-    try:
-        async with session.get(schedule_url, params=params) as response:
+        # Add one row per pitcher ID
+        rows.extend(
+            (game_datetime, game_pk, pitcher_id, team_name, year)
+            for pitcher_id in pitchers
+        )
+    return rows
 
-            # Handle unwanted status
-            if response.status != 200:
-                print(f"Failed to fetch schedule for season {season}. Status: {response.status}")
-                return []
-            schedule = await response.json()
-    except Exception as e:
-        print(f"Exception while fetching schedule for season {season}: {e}")
-        return []
+# Fetch a game's rows and write them straight to the CSV.
+async def write_game_rows(writer, session, game, semaphore):
+    writer.writerows(await fetch_game_data(session, *game, semaphore))
 
-    # Compile list of game IDs
-    game_pks = []
-    for day in schedule.get("dates", []):
-        for game in day.get("games", []):
-            game_pk = game.get("gamePk")
-            if game_pk:
-                game_pks.append(game_pk)
-    return game_pks
+# Async function to fetch all (gamePk, season) entries for a given season.
+async def fetch_season_games(session, season, semaphore):
+    games = await get_season_games(session, season, GAME_TYPES, semaphore)
+    return [(game["gamePk"], season) for game in games]
 
 # Run tasks to fetch data.
-async def main():
-    semaphore = asyncio.Semaphore(10)  # Limit concurrent requests to 10
-    all_game_pitcher_data = []
-
-    async with aiohttp.ClientSession() as session:
-        for season in range(FIRST_SEASON, LAST_SEASON):
-            print(f"Processing season {season}...")
-            game_pks = await fetch_season_games(session, season)
-            print(f"Found {len(game_pks)} games for season {season}")
-
-            # Define the tasks for each game.
-            tasks = [fetch_game_data(session, game_pk, semaphore) for game_pk in game_pks]
-            
-            # Use tqdm to track progress as tasks complete.
-            season_results = []
-            for task in tqdm(
-                asyncio.as_completed(tasks), 
-                total=len(tasks), 
-                desc=f"Season {season} progress",
+@collector
+async def main(session, semaphore):
+
+    # Fetch every season's schedule at once.
+    seasons = range(FIRST_SEASON, LAST_SEASON)
+    season_games = await asyncio.gather(
+        *(fetch_season_games(session, season, semaphore) for season in seasons)
+    )
+    games = []
+    for season, entries in zip(seasons, season_games):
+        print(f"Found {len(entries)} games for season {season}")
+        games.extend(entries)
+
+    # Handle empty entries.
+    if not games:
+        print("No games found in schedules.")
+        return
+
+    # Rows are written as each game arrives rather than collected first.
+    # They go to a partial file that replaces OUTPUT_FILE only once every
+    # game is done, so an interrupted run leaves the previous CSV intact.
+    # The line ending matches what pandas' to_csv wrote.
+    partial_file = f"{OUTPUT_FILE}.partial"
+    try:
+        with open(partial_file, "w", newline="", buffering=1 << 20) as output:
+            writer = csv.writer(output, lineterminator=os.linesep)
+            writer.writerow(OUTPUT_COLUMNS)
+
+            # Fetch all games from one worker pool with a single progress bar.
+            await map_pooled(
+                lambda game: write_game_rows(writer, session, game, semaphore),
+                games,
+                desc="Processing games",
                 dynamic_ncols=True
-            ):
-                result = await task
-                season_results.append(result)
-            
-            # Extend the event list with non-empty results.
-            for events in season_results:
-                if events:
-                    all_game_pitcher_data.extend(events)
-    
-    # Build a DataFrame from the collected records
-    df = pd.DataFrame(all_game_pitcher_data)
-    df['game_datetime'] = pd.to_datetime(df['game_datetime'])
-    df['year'] = df['game_datetime'].dt.year
-    
-    # Output data to CSV
-    df.to_csv(OUTPUT_FILE, index=False)
+            )
+    except BaseException:
+        os.remove(partial_file)
+        raise
+    os.replace(partial_file, OUTPUT_FILE)
+
     print(f"Data collection complete. Saved to '{OUTPUT_FILE}'.")
 
 # Run async functions and report the elapsed time.
 if __name__ == "__main__":
     start_time = time.time()
-    asyncio.run(main())
+    run(main())
     elapsed_time = time.time() - start_time
     print(f"Time elapsed: {elapsed_time:.2f} seconds")
@@ -1,22 +1,27 @@
 import asyncio
-import aiohttp
 import pandas as pd
 import time
 from datetime import datetime
-from tqdm import tqdm
+from _mlb_client import (
+    collector, fetch_json, get_season_games, map_pooled, run
+)
 
 # -------------------------------
 # Constants
 #
 # BASE_URL_GAME: MLB stats API location for live game data
-# BASE_URL_SCHEDULE: MLB stats API location for schedules
+# GAME_FIELDS: Live feed fields to request (the API drops all others)
 # GAME_TYPES: S = Spring training, R = Regular season, P = Post season
 # FIRST_SEASON: Year to start (included)
 # LAST_SEASON: Year to end (not included)
 # OUTPUT_FILE: File name and extension for export
 # -------------------------------
 BASE_URL_GAME = "https://statsapi.mlb.com/api/v1.1"
-BASE_URL_SCHEDULE = "https://statsapi.mlb.com/api/v1"
+GAME_FIELDS = (
+    "gameData,game,pk,datetime,dateTime,teams,home,away,name,"
+    "liveData,plays,allPlays,about,inning,isTopInning,matchup,pitcher,fullName,"
+    "playEvents,details,description"
+)
 GAME_TYPES = "R"
 FIRST_SEASON = 2014
 LAST_SEASON = 2025
@@ -34,44 +39,49 @@ def identify_mid_inning_pitching_changes(game_feed):
     game_data = game_feed.get("gameData", {})
     game_id = game_data.get("game", {}).get("pk")
     
-    # Extract season year from game dateTime; if missing, year remains None.
+    # Extract season year from game dateTime; if missing, both remain None.
     datetime_str = game_data.get("datetime", {}).get("dateTime")
     if datetime_str:
         game_dt = parse_iso_time(datetime_str)
         year = game_dt.year
     else:
-        year = None
+        game_dt = year = None
 
     # Determine team names from game data.
     teams = game_data.get("teams", {})
     home_team = teams.get("home", {}).get("name")
     away_team = teams.get("away", {}).get("name")
     
-    prev_inning = None
-    prev_half = None
+    prev_half_inning = None
     prev_pitcher = None
 
     # Process plays sequentially.
     for play in all_plays:
         about = play.get("about", {})
-        inning = about.get("inning")
         isTopInning = about.get("isTopInning")
-        
+        half_inning = (about.get("inning"), isTopInning)
+
+        # A new half-inning has no earlier pitcher to compare against,
+        # so a change can only be found from its second play on.
+        if half_inning != prev_half_inning:
+            prev_half_inning = half_inning
+            prev_pitcher = None
+
         # Get current pitcher id (if available) from the matchup field.
         current_pitcher = play.get("matchup", {}).get("pitcher", {}).get("fullName")
         
-        # Look into the nested playEvents to see
-        # if a pitching change is indicated.
-        for pe in play.get("playEvents", []):
-            details = pe.get("details", {})
-            description = details.get("description", "").lower()
-            if "pitching change" in description:
-              
-                # Only consider if it is truly a mid-inning event
-                # and the pitcher has indeed changed.
-                if (prev_inning is not None and inning == prev_inning and isTopInning == prev_half and
-                    prev_pitcher is not None and current_pitcher is not None and prev_pitcher != current_pitcher):
-                    
+        # Only consider plays where the pitcher has indeed changed
+        # mid-inning; every other play is skipped without scanning its
+        # playEvents.
+        if (prev_pitcher is not None and current_pitcher is not None and
+            prev_pitcher != current_pitcher):
+
+            # Look into the nested playEvents to see
+            # if a pitching change is indicated.
+            for pe in play.get("playEvents", []):
+                description = pe.get("details", {}).get("description")
+                if description and "pitching change" in description.lower():
+
                     # Determine which team made the pitching change.
                     # If top half (away batting) then the home team is pitching.
                     team_name = home_team if isTopInning else away_team
@@ -83,13 +93,11 @@ def identify_mid_inning_pitching_changes(game_feed):
                         "pitcher_old": prev_pitcher,
                         "pitcher_new": current_pitcher
                     })
-                    
-                # Once a pitching change event is found in this play, move on.
-                break
-              
+
+                    # Once a pitching change event is found in this play, move on.
+                    break
+
         # Update previous play details.
-        prev_inning = inning
-        prev_half = isTopInning
         if current_pitcher is not None:
             prev_pitcher = current_pitcher
 
@@ -97,79 +105,55 @@ def identify_mid_inning_pitching_changes(game_feed):
 
 # Async function to fetch the live feed for a given game
 # and process identified pitching changes.
-async def fetch_game_events(session, game_id, semaphore):
+async def fetch_game_events(session, game_id, season, semaphore):
     url = f"{BASE_URL_GAME}/game/{game_id}/feed/live"
-    async with semaphore:
-        try:
-            async with session.get(url) as response:
-              
-                # Handle unwanted status
-                if response.status != 200:
-                    print(f"Failed to fetch game {game_id}. Status: {response.status}")
-                    return []
-                data = await response.json()
-        except Exception as e:
-            print(f"Error fetching game {game_id}: {e}")
+    try:
+        status, data = await fetch_json(
+            session, url, {"fields": GAME_FIELDS}, semaphore,
+            cache=True, season=season
+        )
+
+        # Handle unwanted status
+        if status != 200:
+            print(f"Failed to fetch game {game_id}. Status: {status}")
             return []
+    except Exception as e:
+        print(f"Error fetching game {game_id}: {e}")
+        return []
     return identify_mid_inning_pitching_changes(data)
 
 # Async function to fetch game IDs for each season.
-async def fetch_season_games(session, season):
-    schedule_url = f"{BASE_URL_SCHEDULE}/schedule"
-    params = {
-        "sportId": 1, # MLB
-        "season": season,
-        "gameTypes": GAME_TYPES
-    }
-    try:
-        async with session.get(schedule_url, params=params) as response:
-          
-            # Handle unwanted status.
-            if response.status != 200:
-                print(f"Failed to fetch schedule for season {season}. Status: {response.status}")
-                return []
-            schedule = await response.json()
-    except Exception as e:
-        print(f"Exception while fetching schedule for season {season}: {e}")
-        return []
-    
-    game_ids = []
-    for date_info in schedule.get("dates", []):
-        for game in date_info.get("games", []):
-            game_pk = game.get("gamePk")
-            if game_pk:
-                game_ids.append(str(game_pk))
-    return game_ids
+async def fetch_season_games(session, season, semaphore):
+    games = await get_season_games(session, season, GAME_TYPES, semaphore)
+    return [str(game["gamePk"]) for game in games]
 
 # Run tasks to fetch data.
-async def main():
-    semaphore = asyncio.Semaphore(10)  # Limit concurrent requests to 10.
+@collector
+async def main(session, semaphore):
     all_events = []
 
-    async with aiohttp.ClientSession() as session:
-        for season in range(FIRST_SEASON, LAST_SEASON):
-            print(f"Processing season {season}...")
-            game_ids = await fetch_season_games(session, season)
-            print(f"Found {len(game_ids)} games for season {season}.")
-            
-            # Define the tasks for each game.
-            tasks = [fetch_game_events(session, game_id, semaphore) for game_id in game_ids]
-            
-            # Use tqdm to track progress as tasks complete.
-            season_results = []
-            for task in tqdm(
-                asyncio.as_completed(tasks), 
-                total=len(tasks), 
-                desc=f"Season {season} progress",
-                dynamic_ncols=True
-            ):
-                result = await task
-                season_results.append(result)
-            
-            # Extend our event list with non-empty results.
-            for events in season_results:
-                if events:
-                    all_events.extend(events)
+    # Fetch every season's schedule at once.
+    seasons = range(FIRST_SEASON, LAST_SEASON)
+    season_game_ids = await asyncio.gather(
+        *(fetch_season_games(session, season, semaphore) for season in seasons)
+    )
+    games = []
+    for season, game_ids in zip(seasons, season_game_ids):
+        print(f"Found {len(game_ids)} games for season {season}.")
+        games.extend((game_id, season) for game_id in game_ids)
+
+    # Fetch all games from one worker pool with a single progress bar.
+    results = await map_pooled(
+        lambda game: fetch_game_events(session, *game, semaphore),
+        games,
+        desc="Processing games",
+        dynamic_ncols=True
+    )
+
+    # Extend our event list with non-empty results.
+    for events in results:
+        if events:
+            all_events.extend(events)
 
     # Handle empty entries.
     if not all_events:
@@ -186,6 +170,6 @@ async def main():
 # Run async functions and report the elapsed time.
 if __name__ == "__main__":
     start_time = time.time()
-    asyncio.run(main())
+    run(main())
     elapsed_time = time.time() - start_time
     print(f"Time elapsed: {elapsed_time:.2f} seconds")
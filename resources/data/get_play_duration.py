@@ -1,21 +1,22 @@
 import asyncio
-import aiohttp
 import pandas as pd
 import time
-from tqdm import tqdm
+from _mlb_client import (
+    collector, fetch_json, get_season_games, map_pooled, run
+)
 
 # -------------------------------
 # Constants
 #
-# BASE_URL      : MLB stats API for schedules
-# LIVE_FEED_URL : MLB stats API for live game data
+# BASE_URL      : MLB stats API for play-by-play
+# PLAY_FIELDS   : Play-by-play fields to request (the API drops all others)
 # GAME_TYPES    : S = Spring training, R = Regular season, P = Post season
 # FIRST_SEASON  : Year to start (inclusive)
 # LAST_SEASON   : Year to end   (exclusive)
 # OUTPUT_FILE   : CSV output filename
 # -------------------------------
 BASE_URL      = "https://statsapi.mlb.com/api/v1"
-LIVE_FEED_URL = "https://statsapi.mlb.com/api/v1.1/game"
+PLAY_FIELDS   = "allPlays,about,startTime,endTime"
 GAME_TYPES    = "R"
 FIRST_SEASON  = 2014
 LAST_SEASON   = 2025
@@ -24,100 +25,88 @@ OUTPUT_FILE   = "play_duration.csv"
 
 async def fetch_season_games(session, season, sem):
     """Fetch all regular-season games for a given season."""
-    url = f"{BASE_URL}/schedule"
-    params = {"sportId": 1, "season": season, "gameTypes": GAME_TYPES}
-
-    async with sem:
-        resp = await session.get(url, params=params)
-        if resp.status != 200:
-            print(f"[Season {season}] schedule error: {resp.status}")
-            return []
-        data = await resp.json()
-
-    return [
-        {"season": season, "game_pk": g["gamePk"]}
-        for d in data.get("dates", [])
-        for g in d.get("games", [])
-        if g.get("gamePk")
-    ]
+    games = await get_season_games(session, season, GAME_TYPES, sem)
+    return [{"season": season, "game_pk": g["gamePk"]} for g in games]
 
 async def fetch_play_durations(session, info, sem):
     """
-    For a given game_pk, fetch allPlays and return only:
+    For a given game_pk, fetch allPlays and return one list per column:
       - season
       - game_pk
-      - startTime of each play
-      - duration_sec between startTime and endTime
+      - startTime and endTime of each play (raw strings; main parses
+        them all at once)
     """
     season = info["season"]
     pk     = info["game_pk"]
-    url    = f"{LIVE_FEED_URL}/{pk}/feed/live"
-
-    async with sem:
-        resp = await session.get(url)
-        if resp.status != 200:
-            print(f"[Game {pk}] detail error: {resp.status}")
-            return []
-        data = await resp.json()
-
-    results = []
-    for play in data["liveData"]["plays"]["allPlays"]:
+    url    = f"{BASE_URL}/game/{pk}/playByPlay"
+
+    try:
+        status, data = await fetch_json(
+            session, url, {"fields": PLAY_FIELDS}, sem,
+            cache=True, season=season
+        )
+        if status != 200:
+            print(f"[Game {pk}] detail error: {status}")
+            return {}
+    except Exception as e:
+        print(f"[Game {pk}] request error: {e}")
+        return {}
+
+    starts, ends = [], []
+    for play in data.get("allPlays", []):
         about = play.get("about", {})
         start = about.get("startTime")
         end   = about.get("endTime")
         if not start or not end:
             continue
 
-        start_ts = pd.to_datetime(start)
-        duration = (pd.to_datetime(end) - start_ts).total_seconds()
-        results.append({
-            "season":       season,
-            "game_pk":      pk,
-            "startTime":    start_ts,
-            "duration_sec": duration
-        })
-    return results
+        starts.append(start)
+        ends.append(end)
 
-async def main():
-    start_time = time.time()
-    sem = asyncio.Semaphore(10)
-
-    async with aiohttp.ClientSession() as session:
-        # 1) Gather all games across seasons
-        sched_tasks = [
-            asyncio.create_task(fetch_season_games(session, yr, sem))
-            for yr in range(FIRST_SEASON, LAST_SEASON)
-        ]
-        all_games = []
-        for season_games in await asyncio.gather(*sched_tasks):
-            all_games.extend(season_games)
-
-        # 2) Fetch play startTimes & durations
-        play_tasks = [
-            asyncio.create_task(fetch_play_durations(session, g, sem))
-            for g in all_games
-        ]
+    return {
+        "season":    [season] * len(starts),
+        "game_pk":   [pk] * len(starts),
+        "startTime": starts,
+        "endTime":   ends
+    }
 
-        all_records = []
-        for fut in tqdm(asyncio.as_completed(play_tasks),
-                        total=len(play_tasks),
-                        desc="Processing games"):
-            recs = await fut
-            if recs:
-                all_records.extend(recs)
+@collector
+async def main(session, sem):
+    start_time = time.time()
 
-    if not all_records:
+    # 1) Gather all games across seasons
+    sched_tasks = [
+        asyncio.create_task(fetch_season_games(session, yr, sem))
+        for yr in range(FIRST_SEASON, LAST_SEASON)
+    ]
+    all_games = []
+    for season_games in await asyncio.gather(*sched_tasks):
+        all_games.extend(season_games)
+
+    # 2) Fetch play startTimes & endTimes from a worker pool,
+    #    collecting one list per column
+    columns = {"season": [], "game_pk": [], "startTime": [], "endTime": []}
+    for recs in await map_pooled(
+        lambda g: fetch_play_durations(session, g, sem),
+        all_games,
+        desc="Processing games"
+    ):
+        for name, values in recs.items():
+            columns[name].extend(values)
+
+    if not columns["game_pk"]:
         print("No play records found.")
         return
 
-    # Build DataFrame with only the retained columns
-    df = pd.DataFrame(all_records, columns=[
-        "season", "game_pk", "startTime", "duration_sec"
-    ])
+    # Build DataFrame, then parse every timestamp in one vectorized pass
+    df = pd.DataFrame(columns)
+    df["startTime"] = pd.to_datetime(df["startTime"], format="ISO8601", cache=True)
+    end_time = pd.to_datetime(df.pop("endTime"), format="ISO8601", cache=True)
+    df["duration_sec"] = (end_time - df["startTime"]).dt.total_seconds()
     df.to_csv(OUTPUT_FILE, index=False)
 
     elapsed = time.time() - start_time
     print(f"Done: {len(df)} records → '{OUTPUT_FILE}' ({elapsed:.1f}s)")
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run(main())
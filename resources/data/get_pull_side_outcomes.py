@@ -1,21 +1,25 @@
 import asyncio
-import aiohttp
 import pandas as pd
 import time
-from tqdm import tqdm
+from _mlb_client import (
+    collector, fetch_json, get_game_datetime, get_season_games, map_pooled, run
+)
 
 # -------------------------------
 # Constants
 #
-# BASE_URL      : MLB stats API for schedules
-# LIVE_FEED_URL : MLB stats API for live game data
+# BASE_URL      : MLB stats API for play-by-play
+# PLAY_FIELDS   : Play-by-play fields to request (the API drops all others)
 # GAME_TYPES    : S = Spring training, R = Regular season, P = Post season
 # FIRST_SEASON  : Year to start (inclusive)
 # LAST_SEASON   : Year to end   (exclusive)
 # OUTPUT_FILE   : CSV output filename
 # -------------------------------
 BASE_URL      = "https://statsapi.mlb.com/api/v1"
-LIVE_FEED_URL = "https://statsapi.mlb.com/api/v1.1/game"
+PLAY_FIELDS   = (
+    "allPlays,matchup,batSide,code,playEvents,hitData,location,"
+    "result,eventType"
+)
 GAME_TYPES    = "R"
 FIRST_SEASON  = 2014
 LAST_SEASON   = 2025
@@ -27,30 +31,31 @@ PULL_LOCATIONS = {
     "R": {"25", "5S", "56S", "15", "6S", "6MS", "5", "56", "6", "6M"},
     "L": {"23", "3S", "34S", "13", "4S", "4MS", "3", "34", "4", "4M"},
 }
+# The same locations as (bat_side, location) pairs, checked in one lookup
+PULL_SIDE = frozenset(
+    (side, loc) for side, locs in PULL_LOCATIONS.items() for loc in locs
+)
+
+# Play result event types by outcome
+HIT_EVENTS = frozenset({"single", "double", "triple", "home_run", "fielders_choice"})
+ERROR_EVENTS = frozenset({"field_error", "error"})
+OUT_EVENTS = frozenset({
+    "double_play", "field_out", "fielders_choice_out", "force_out",
+    "grounded_into_double_play", "grounded_into_triple_play", "triple_play",
+    "cs_double_play", "sac_fly", "sac_bunt", "sac_bunt_double_play"
+})
 
 async def fetch_season_games(session, season, sem):
     """Fetch all regular-season games for a given season."""
-    url = f"{BASE_URL}/schedule"
-    params = {"sportId": 1, "season": season, "gameTypes": GAME_TYPES}
-    async with sem:
-        resp = await session.get(url, params=params)
-        if resp.status != 200:
-            print(f"[Season {season}] schedule error: {resp.status}")
-            return []
-        data = await resp.json()
-
-    return [
-        {"season": season, "game_pk": g["gamePk"]}
-        for d in data.get("dates", [])
-        for g in d.get("games", [])
-        if g.get("gamePk")
-    ]
+    games = await get_season_games(session, season, GAME_TYPES, sem)
+    return [{"season": season, "game_pk": g["gamePk"]} for g in games]
 
 async def fetch_pull_outcomes(session, info, sem):
     """
-    For a given game_pk, fetch allPlays and return only those where
-    the ball was hit to the batter's pull side near the infield.
-    Returns rows with:
+    For a given game_pk, fetch allPlays and the start time, and return
+    only the plays where the ball was hit to the batter's pull side near
+    the infield.
+    Returns one list per column:
       - season
       - game_datetime
       - game_pk
@@ -60,24 +65,25 @@ async def fetch_pull_outcomes(session, info, sem):
     """
     season   = info["season"]
     pk       = info["game_pk"]
-    url      = f"{LIVE_FEED_URL}/{pk}/feed/live"
-
-    async with sem:
-        resp = await session.get(url)
-        if resp.status != 200:
-            print(f"[Game {pk}] live feed error: {resp.status}")
-            return []
-        data = await resp.json()
-
-    # game start datetime
-    game_dt = data.get("gameData", {}) \
-                  .get("datetime", {}) \
-                  .get("dateTime")
-
-    records = []
-    for play in data.get("liveData", {}) \
-                    .get("plays", {}) \
-                    .get("allPlays", []):
+    url      = f"{BASE_URL}/game/{pk}/playByPlay"
+
+    try:
+        (status, data), game_dt = await asyncio.gather(
+            fetch_json(
+                session, url, {"fields": PLAY_FIELDS}, sem,
+                cache=True, season=season
+            ),
+            get_game_datetime(session, pk, season, sem)
+        )
+        if status != 200:
+            print(f"[Game {pk}] live feed error: {status}")
+            return {}
+    except Exception as e:
+        print(f"[Game {pk}] request error: {e}")
+        return {}
+
+    bat_sides, hit_locations, play_outcomes = [], [], []
+    for play in data.get("allPlays", []):
         # batter hand: "R" or "L"
         bat_side = play.get("matchup", {}) \
                        .get("batSide", {}) \
@@ -93,79 +99,77 @@ async def fetch_pull_outcomes(session, info, sem):
                 continue
 
             loc_str = str(loc)
-            if loc_str not in PULL_LOCATIONS[bat_side]:
+            if (bat_side, loc_str) not in PULL_SIDE:
                 continue
 
             # classify outcome from play-level result
             evt_id = play.get("result", {}) \
                          .get("eventType", "")
-            if evt_id in {"single", "double", "triple", "home_run", "fielders_choice"}:
+            if evt_id in HIT_EVENTS:
                 outcome = "hit"
-            elif evt_id in {"field_error", "error"}:
+            elif evt_id in ERROR_EVENTS:
                 outcome = "error"
-            elif evt_id in {"double_play", "field_out", "fielders_choice_out", "force_out", "grounded_into_double_play", "grounded_into_triple_play", "triple_play", "cs_double_play", "sac_fly", "sac_bunt", "sac_bunt_double_play"}:
+            elif evt_id in OUT_EVENTS:
                 outcome = "out"
             else:
                 outcome = "unknown"
 
-            records.append({
-                "season":        season,
-                "game_datetime": game_dt,
-                "game_pk":       pk,
-                "bat_side":      bat_side,
-                "hit_location":  loc_str,
-                "play_outcome":  outcome
-            })
+            bat_sides.append(bat_side)
+            hit_locations.append(loc_str)
+            play_outcomes.append(outcome)
             # one record per play
             break
 
-    return records
-
-async def main():
+    return {
+        "season":        [season] * len(bat_sides),
+        "game_datetime": [game_dt] * len(bat_sides),
+        "game_pk":       [pk] * len(bat_sides),
+        "bat_side":      bat_sides,
+        "hit_location":  hit_locations,
+        "play_outcome":  play_outcomes
+    }
+
+@collector
+async def main(session, sem):
     start_time = time.time()
-    sem = asyncio.Semaphore(10)
-
-    async with aiohttp.ClientSession() as session:
-        # 1) Gather all games across seasons
-        sched_tasks = [
-            asyncio.create_task(fetch_season_games(session, yr, sem))
-            for yr in range(FIRST_SEASON, LAST_SEASON)
-        ]
-        all_games = []
-        for season_games in await asyncio.gather(*sched_tasks):
-            all_games.extend(season_games)
-
-        # 2) Fetch pull‐side outcomes for each game
-        outcome_tasks = [
-            asyncio.create_task(fetch_pull_outcomes(session, g, sem))
-            for g in all_games
-        ]
-
-        all_records = []
-        for fut in tqdm(asyncio.as_completed(outcome_tasks),
-                        total=len(outcome_tasks),
-                        desc="Processing games"):
-            recs = await fut
-            if recs:
-                all_records.extend(recs)
-
-    if not all_records:
+
+    # 1) Gather all games across seasons
+    sched_tasks = [
+        asyncio.create_task(fetch_season_games(session, yr, sem))
+        for yr in range(FIRST_SEASON, LAST_SEASON)
+    ]
+    all_games = []
+    for season_games in await asyncio.gather(*sched_tasks):
+        all_games.extend(season_games)
+
+    # 2) Fetch pull‐side outcomes for each game from a worker pool,
+    #    collecting one list per column
+    columns = {
+        "season":        [],
+        "game_datetime": [],
+        "game_pk":       [],
+        "bat_side":      [],
+        "hit_location":  [],
+        "play_outcome":  []
+    }
+    for recs in await map_pooled(
+        lambda g: fetch_pull_outcomes(session, g, sem),
+        all_games,
+        desc="Processing games"
+    ):
+        for name, values in recs.items():
+            columns[name].extend(values)
+
+    if not columns["game_pk"]:
         print("No pull-side plays found.")
         return
 
     # Build DataFrame & write CSV
-    df = pd.DataFrame(all_records, columns=[
-        "season",
-        "game_datetime",
-        "game_pk",
-        "bat_side",
-        "hit_location",
-        "play_outcome"
-    ])
+    df = pd.DataFrame(columns)
     df.to_csv(OUTPUT_FILE, index=False)
 
     elapsed = time.time() - start_time
     print(f"Done: {len(df)} records → '{OUTPUT_FILE}' ({elapsed:.1f}s)")
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run(main())
@@ -1,8 +1,8 @@
 import asyncio
-import aiohttp
 import pandas as pd
 import time
 from tqdm import tqdm
+from _mlb_client import collector, fetch_json, run
 
 # -------------------------------
 # Constants
@@ -35,12 +35,17 @@ async def fetch_season_team_babip(session, season, sem):
         "sportIds":   "1",            # MLB only
     }
 
-    async with sem:
-        resp = await session.get(url, params=params)
-        if resp.status != 200:
-            print(f"[Season {season}] stats error: {resp.status}")
+    try:
+        status, data = await fetch_json(
+            session, url, params, sem,
+            cache=True, season=season
+        )
+        if status != 200:
+            print(f"[Season {season}] stats error: {status}")
             return []
-        data = await resp.json()
+    except Exception as e:
+        print(f"[Season {season}] request error: {e}")
+        return []
 
     out = []
     for split in data.get("stats", [])[0].get("splits", []):
@@ -55,25 +60,24 @@ async def fetch_season_team_babip(session, season, sem):
         })
     return out
 
-async def main():
+@collector
+async def main(session, sem):
     start_time = time.time()
-    sem = asyncio.Semaphore(10)
 
-    async with aiohttp.ClientSession() as session:
-        # 1) One task per season
-        tasks = [
-            asyncio.create_task(fetch_season_team_babip(session, yr, sem))
-            for yr in range(FIRST_SEASON, LAST_SEASON)
-        ]
+    # 1) One task per season
+    tasks = [
+        asyncio.create_task(fetch_season_team_babip(session, yr, sem))
+        for yr in range(FIRST_SEASON, LAST_SEASON)
+    ]
 
-        # 2) Gather and flatten with a progress bar
-        all_records = []
-        for fut in tqdm(asyncio.as_completed(tasks),
-                        total=len(tasks),
-                        desc="Fetching BABIP by season"):
-            recs = await fut
-            if recs:
-                all_records.extend(recs)
+    # 2) Gather and flatten with a progress bar
+    all_records = []
+    for fut in tqdm(asyncio.as_completed(tasks),
+                    total=len(tasks),
+                    desc="Fetching BABIP by season"):
+        recs = await fut
+        if recs:
+            all_records.extend(recs)
 
     if not all_records:
         print("No BABIP records found.")
@@ -89,4 +93,4 @@ async def main():
     print(f"Done: {len(df)} rows → '{OUTPUT_FILE}' ({elapsed:.1f}s)")
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run(main())
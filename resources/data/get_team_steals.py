@@ -1,8 +1,8 @@
 import asyncio
-import aiohttp
 import pandas as pd
 import time
 from tqdm import tqdm
+from _mlb_client import collector, fetch_json, run
 
 # -------------------------------
 # Constants
@@ -36,12 +36,17 @@ async def fetch_season_team_stats(session, season, sem):
         "sportIds":   "1",            # ensure MLB only
     }
 
-    async with sem:
-        resp = await session.get(url, params=params)
-        if resp.status != 200:
-            print(f"[Season {season}] stats error: {resp.status}")
+    try:
+        status, data = await fetch_json(
+            session, url, params, sem,
+            cache=True, season=season
+        )
+        if status != 200:
+            print(f"[Season {season}] stats error: {status}")
             return []
-        data = await resp.json()
+    except Exception as e:
+        print(f"[Season {season}] request error: {e}")
+        return []
 
     out = []
     for split in data.get("stats", [])[0].get("splits", []):
@@ -57,25 +62,24 @@ async def fetch_season_team_stats(session, season, sem):
         })
     return out
 
-async def main():
+@collector
+async def main(session, sem):
     start_time = time.time()
-    sem = asyncio.Semaphore(10)
 
-    async with aiohttp.ClientSession() as session:
-        # 1) Schedule one task per season
-        tasks = [
-            asyncio.create_task(fetch_season_team_stats(session, yr, sem))
-            for yr in range(FIRST_SEASON, LAST_SEASON)
-        ]
+    # 1) Schedule one task per season
+    tasks = [
+        asyncio.create_task(fetch_season_team_stats(session, yr, sem))
+        for yr in range(FIRST_SEASON, LAST_SEASON)
+    ]
 
-        # 2) Gather results with tqdm
-        all_records = []
-        for fut in tqdm(asyncio.as_completed(tasks),
-                        total=len(tasks),
-                        desc="Fetching seasons"):
-            recs = await fut
-            if recs:
-                all_records.extend(recs)
+    # 2) Gather results with tqdm
+    all_records = []
+    for fut in tqdm(asyncio.as_completed(tasks),
+                    total=len(tasks),
+                    desc="Fetching seasons"):
+        recs = await fut
+        if recs:
+            all_records.extend(recs)
 
     if not all_records:
         print("No data returned.")
@@ -92,4 +96,4 @@ async def main():
     print(f"Done: {len(df)} rows → {OUTPUT_FILE} ({elapsed:.1f}s)")
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run(main())
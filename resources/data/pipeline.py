@@ -0,0 +1,56 @@
+import asyncio
+import time
+import get_extra_innings_games
+import get_games_played
+import get_nl_ops
+import get_pitcher_appearances
+import get_pitching_changes_mid_inning
+import get_play_duration
+import get_pull_side_outcomes
+import get_team_babip
+import get_team_steals
+from _mlb_client import CONCURRENCY, make_session, run
+
+# -------------------------------
+# Constants
+#
+# COLLECTORS: Scripts run together, each writing its own CSV
+# -------------------------------
+COLLECTORS = [
+    get_games_played,
+    get_pitcher_appearances,
+    get_extra_innings_games,
+    get_nl_ops,
+    get_play_duration,
+    get_pull_side_outcomes,
+    get_pitching_changes_mid_inning,
+    get_team_babip,
+    get_team_steals
+]
+# -------------------------------
+
+# Run every collector together on one session, so they share its
+# connection pool and DNS cache, and under one semaphore, so no more
+# than CONCURRENCY requests are in flight across all of them. Every
+# response lands in the on-disk cache, so after this one network pass
+# any script can be rerun from local data. Each collector still writes
+# its own CSV, unchanged. A collector that fails is reported without
+# cancelling the others.
+async def main():
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    async with make_session() as session:
+        results = await asyncio.gather(
+            *(collector.main(session, semaphore) for collector in COLLECTORS),
+            return_exceptions=True
+        )
+
+    for collector, result in zip(COLLECTORS, results):
+        if isinstance(result, BaseException):
+            print(f"{collector.__name__} failed: {result!r}")
+
+# Run async functions and report the elapsed time.
+if __name__ == "__main__":
+    start_time = time.time()
+    run(main())
+    elapsed_time = time.time() - start_time
+    print(f"Time elapsed: {elapsed_time:.2f} seconds")